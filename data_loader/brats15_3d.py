@@ -22,7 +22,7 @@ import torch.nn as nn
 import torch
 from torch.utils.data import Dataset
 import numpy as np
-import scipy.misc
+from PIL import Image
 
 from src.utils import *
 
@@ -94,30 +94,23 @@ class Brats15DataLoader(Dataset):
             elif 'OT.' in f:        # if is label
                 label_dir = f
 
-        bbmin = [0, 0, 0]  # default bounding box
-        bbmax = [155 - 1, 240 - 1, 240 - 1]
         # ********** load 4 mode images **********
-        multi_mode_imgs = []  # list size :4      item size: 150 * 240 * 240
-        for mod_dir in multi_mode_dir:
-            path = os.path.join(subject, mod_dir)  # absolute directory
-            img = load_mha_as_array(path + '/' + mod_dir + '.mha')
-            multi_mode_imgs.append(img)
-            if 'Flair.' in mod_dir:  # get non zero bounding box based on Flair image
-                bbmin, bbmax = get_ND_bounding_box(img, self.margin)
+        # list size :4      item size: 150 * 240 * 240
+        paths = [os.path.join(subject, d) + '/' + d + '.mha' for d in multi_mode_dir]
+        flair = [i for i, d in enumerate(multi_mode_dir) if 'Flair.' in d]
+        # step1 ****** crop, normalize and transpose images, bounding box based on Flair image *******
+        multi_mode_imgs, bbmin, bbmax = preprocess_modalities(
+            paths, self.margin, self.data_box, bbox_modal=flair[0] if flair else None,
+            slice_direction=self.direction)
 
         # ********** get label **********
         label_dir = os.path.join(subject, label_dir) + '/' + label_dir + '.mha'
         label = load_mha_as_array(label_dir)  #
 
-        # *********** image pre-processing *************
-        # step1 ****** resize images and labels to 160 * 192 * 192 *******
-        for i in range(len(multi_mode_imgs)):
-            multi_mode_imgs[i] = crop_with_box(multi_mode_imgs[i], bbmin, bbmax, self.data_box)
-            multi_mode_imgs[i] = normalize_one_volume(multi_mode_imgs[i])
+        # *********** label pre-processing *************
         label = crop_with_box(label, bbmin, bbmax, self.data_box)
 
-        # step2 ********* transfer images to different direction *********
-        multi_mode_imgs = transpose_volumes(multi_mode_imgs, self.direction)
+        # step2 ********* transfer label to different direction *********
         label = transpose_volumes([label], self.direction)[0]
 
         # step3 ********** get bounding box based on task **********
@@ -199,7 +192,7 @@ if __name__ =="__main__":
         out = np.zeros((192, 200))
         out[:, :96] = sample_img[:,:96]
         out[:, 100:196] = sample_img[:, 96:]
-        scipy.misc.imsave('img/img_%s_wt.jpg' % ddd[i], out)
+        Image.fromarray((out * 255).astype(np.uint8)).save('img/img_%s_wt.jpg' % ddd[i])
 
     print ('get sample of labels')
     sample_label = labels[vol_num][0, slice, :, :]           # 192 * 192
@@ -207,7 +200,7 @@ if __name__ =="__main__":
     label = np.ones((192, 200))
     label[:, :96] = sample_label[:,:96]
     label[:, 100:196] = sample_label[:, 96:]
-    scipy.misc.imsave('img/label_wt.jpg', label)
+    Image.fromarray((norm(label) * 255).astype(np.uint8)).save('img/label_wt.jpg')
 
 
 
@@ -2,19 +2,38 @@
 
 import SimpleITK as sitk
 import numpy as np
-import scipy.misc
 import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+try:
+    import numba
+except ImportError:  # numba is optional, the kernels below fall back to numpy
+    numba = None
+
+_io_pool = ThreadPoolExecutor(max_workers=4)  # background image writer
+
+
+class ImageBuffer(object):
+    """
+    owner of a SimpleITK image exposing its voxel buffer to numpy (read only);
+    np.asarray(ImageBuffer(img)) sets this object as the array base, so the
+    image stays alive as long as any array or view of the buffer does
+    """
+    def __init__(self, image):
+        self.image = image
+        self.__array_interface__ = sitk.GetArrayViewFromImage(image).__array_interface__
 
 
 def load_mha_as_array(img_name):
     """
-    get the numpy array of brain mha image
+    get the numpy array of brain mha image, without copying the voxel buffer
     :param img_name: absolute directory of 3D mha images
     :return:
-        nda  type: numpy    size: 150 * 240 * 240
+        nda  type: numpy (read only)    size: 150 * 240 * 240
     """
     img = sitk.ReadImage(img_name)
-    nda = sitk.GetArrayFromImage(img)
+    nda = np.asarray(ImageBuffer(img))
     return nda
 
 
@@ -31,20 +50,100 @@ def get_ND_bounding_box(volume, margin):
     if (type(margin) is int):
         margin = [margin] * len(input_shape)
 
-    indxes = np.nonzero(volume)  # 每一维度中非0 的数据的位置 (x1, x2, ...xn), (y1,y2,..,yn)
+    mask = volume != 0
     idx_min = []    # type list  [minx, miny, minz]
     idx_max = []    # type list  [maxx, maxy, maxz]
     for i in range(len(input_shape)):  # i = 0, 1, 2
-        idx_min.append(indxes[i].min())
-        idx_max.append(indxes[i].max())
-    # resize bounding box with margin
-    for i in range(len(input_shape)):  # i = 0, 1, 2
-        idx_min[i] = max(idx_min[i] - margin[i], 0)   # 考虑预留边界
-        idx_max[i] = min(idx_max[i] + margin[i], input_shape[i] - 1)
+        # 将 mask 投影到第 i 维, 得到长度为 shape[i] 的一维 bool 向量
+        proj = np.any(mask, axis=tuple(j for j in range(mask.ndim) if j != i))
+        # first / last True of the projection, resized with margin (考虑预留边界)
+        idx_min.append(max(int(np.argmax(proj)) - margin[i], 0))
+        idx_max.append(min(int(len(proj) - 1 - np.argmax(proj[::-1])) + margin[i],
+                           input_shape[i] - 1))
 
     return idx_min, idx_max
 
 
+if numba is not None:
+    @numba.njit(nogil=True, cache=True)
+    def _nonzero_bounds(volume):
+        """
+        [minx, miny, minz, maxx, maxy, maxz] of the non zero voxels in one pass:
+        a vectorized or-reduction per row, the row ends are only searched in
+        rows holding a non zero voxel; an empty volume gives the full box
+        """
+        nz, ny, nx = volume.shape
+        bounds = np.array([nz, ny, nx, -1, -1, -1], dtype=np.int64)
+        for z in range(nz):
+            for y in range(ny):
+                acc = 0
+                for x in range(nx):
+                    acc |= volume[z, y, x]
+                if acc == 0:
+                    continue
+                bounds[0] = min(bounds[0], z)
+                bounds[3] = z
+                bounds[1] = min(bounds[1], y)
+                bounds[4] = max(bounds[4], y)
+                # only the columns outside the current x bounds can extend them
+                x = 0
+                while x < bounds[2] and volume[z, y, x] == 0:
+                    x += 1
+                bounds[2] = min(bounds[2], x)
+                x = nx - 1
+                while x > bounds[5] and volume[z, y, x] == 0:
+                    x -= 1
+                bounds[5] = max(bounds[5], x)
+        if bounds[3] < 0:
+            bounds[:3] = 0
+            bounds[3] = nz - 1
+            bounds[4] = ny - 1
+            bounds[5] = nx - 1
+        return bounds
+
+    @numba.njit(nogil=True, cache=True)
+    def _foreground_sums(volume):
+        """
+        count, sum and sum of squares of the volume > 0 voxels in one pass,
+        accumulated in float64
+        """
+        n = 0
+        total = 0.0
+        total_sq = 0.0
+        nz, ny, nx = volume.shape
+        for z in range(nz):
+            for y in range(ny):
+                row = 0.0  # per row partial sums keep the float64 chains short
+                row_sq = 0.0
+                for x in range(nx):
+                    v = volume[z, y, x]
+                    if v > 0:
+                        n += 1
+                        row += v
+                        row_sq += np.float64(v) * v
+                total += row
+                total_sq += row_sq
+        return n, total, total_sq
+
+    # serial and nogil: thread safe, preprocess_modalities runs one kernel
+    # per modal on its thread pool instead of using a numba threading layer
+    @numba.njit(nogil=True, cache=True)
+    def _normalize_transpose(volume, mean, inv_std, axes, out):
+        """
+        out = ((volume - mean) * inv_std).transpose(axes), one pass over volume
+        """
+        nz, ny, nx = volume.shape
+        idx = np.empty(3, dtype=np.int64)  # source index (z, y, x)
+        for z in range(nz):
+            idx[0] = z
+            for y in range(ny):
+                idx[1] = y
+                for x in range(nx):
+                    idx[2] = x
+                    out[idx[axes[0]], idx[axes[1]], idx[axes[2]]] = \
+                        (volume[z, y, x] - mean) * inv_std
+
+
 def resize_image(volume, box):
     """
 
@@ -57,32 +156,40 @@ def resize_image(volume, box):
     idx_min = []    # type list  [, 24, 24]
     idx_max = []    # type list  [maxx, 216, 216]
     for i in range(len(input_shape)):
-        idx_min.append(np.abs(input_shape[i] / 2 - box[i]/2))
-        idx_max.append(input_shape[i] / 2 + box[i]/2)
-
-    output = np.zeros(box)
-    output[idx_min[0]-1:idx_max[0], :, :] = volume[0:input_shape[0],
-                                            idx_min[1]:idx_max[1],idx_min[2]:idx_max[2]]
+        idx_min.append(int(abs(input_shape[i] // 2 - box[i] // 2)))
+        idx_max.append(int(input_shape[i] // 2 + box[i] // 2))
+
+    slices_out = (slice(idx_min[0] - 1, idx_max[0]), slice(None), slice(None))
+    slices_in = (slice(0, input_shape[0]),
+                 slice(idx_min[1], idx_max[1]), slice(idx_min[2], idx_max[2]))
+
+    # only the rows outside slices_out need zeros, skip the memset elsewhere
+    output = np.empty(tuple(int(b) for b in box), dtype=volume.dtype)
+    output[:slices_out[0].start] = 0
+    output[slices_out[0].stop:] = 0
+    output[slices_out] = volume[slices_in]
     return output
 
 
-def crop_with_box(volume, min_idx, max_idx, MinBox):
+def get_crop_box(input_shape, min_idx, max_idx, MinBox):
     """
-    crop image with bounding box
-    :param volume:      type: 3D numpy.array
+    center a box of size MinBox on the bounding box, shifted to stay inside the volume
+    raises ValueError if MinBox is larger than the volume
+    :param input_shape: shape of the volume to crop
     :param min_idx:     type: list          [minx, miny, minz]
     :param max_idx:     type: list          [maxx, maxy, maxz]
     :param MinBox:      [144 * 192 * 192]
     :return:
-    output  cropped volume
+    min_idx, max_idx    type: list of int, max_idx is exclusive
     """
-    input_shape = volume.shape  # volume 150 * 240 * 240
+    min_idx = [int(i) for i in min_idx]
+    max_idx = [int(i) for i in max_idx]
 
     # ensure we have at least a bounding box of size 16 * 128 * 128
     for i in range(3):
-        mid = (max_idx[i] + min_idx[i]) / 2
-        min_idx[i] = mid - MinBox[i]/2
-        max_idx[i] = mid + MinBox[i]/2
+        mid = (max_idx[i] + min_idx[i]) // 2
+        min_idx[i] = mid - MinBox[i] // 2
+        max_idx[i] = mid + MinBox[i] // 2
 
         margin_max = max_idx[i] - input_shape[i]
         if margin_max > 0:
@@ -94,24 +201,67 @@ def crop_with_box(volume, min_idx, max_idx, MinBox):
             max_idx[i] = max_idx[i] - margin_min + 2
             min_idx[i] = min_idx[i] - margin_min + 2
 
-        if max_idx[i] - min_idx[i] != MinBox[i]:
-            max_idx[i] = min_idx[i] + MinBox[i]
+        # the +2 shifts above can push the box past the volume; keep it inside
+        # so slicing never silently returns less than MinBox
+        if MinBox[i] > input_shape[i]:
+            raise ValueError('crop box %s does not fit in volume of shape %s'
+                             % (list(MinBox), list(input_shape)))
+        min_idx[i] = min(max(min_idx[i], 0), input_shape[i] - MinBox[i])
+        max_idx[i] = min_idx[i] + MinBox[i]
+
+    return min_idx, max_idx
 
-    output = volume[np.ix_(range(min_idx[0], max_idx[0]),
-                           range(min_idx[1], max_idx[1]),
-                           range(min_idx[2], max_idx[2]))]
+
+def crop_with_box(volume, min_idx, max_idx, MinBox):
+    """
+    crop image with bounding box
+    :param volume:      type: 3D numpy.array
+    :param min_idx:     type: list          [minx, miny, minz]
+    :param max_idx:     type: list          [maxx, maxy, maxz]
+    :param MinBox:      [144 * 192 * 192]
+    :return:
+    output  cropped volume (a view of the input volume)
+    """
+    min_idx, max_idx = get_crop_box(volume.shape, min_idx, max_idx, MinBox)
+
+    # basic slicing: the crop is a strided view, not a copy
+    slices = tuple(slice(min_idx[i], max_idx[i]) for i in range(3))
+    output = volume[slices]
     return output
 
 
+def bbox_and_crop(volume, margin, MinBox):
+    """
+    get_ND_bounding_box followed by crop_with_box, the bounding box comes
+    from a single numba pass over the volume when numba is installed
+    :param volume:  type: 3D numpy.array   size: 150 * 240 * 240
+    :param margin:  type int               预留边界
+    :param MinBox:  [144 * 192 * 192]
+    :return:
+    idx_min, idx_max    bounding box as returned by get_ND_bounding_box
+    output              cropped volume (a view of the input volume)
+    """
+    if numba is None or volume.ndim != 3:
+        idx_min, idx_max = get_ND_bounding_box(volume, margin)
+    else:
+        input_shape = volume.shape
+        if (type(margin) is int):
+            margin = [margin] * len(input_shape)
+        bounds = _nonzero_bounds(volume)
+        idx_min = [max(int(bounds[i]) - margin[i], 0) for i in range(3)]
+        idx_max = [min(int(bounds[3 + i]) + margin[i], input_shape[i] - 1) for i in range(3)]
+    output = crop_with_box(volume, idx_min, idx_max, MinBox)
+    return idx_min, idx_max, output
+
+
 def get_whole_tumor_labels(label):
     """
     whole tumor in patient data is label 1 + 2 + 3 + 4
     :param label:  numpy array      size : 155 * 240 * 240  value 0-4
     :return:
-    label 1 * 155 * 240 * 240
+    label 1 * 155 * 240 * 240  uint8
     """
-    label = (label > 0) + 0  # label 1,2,3,4
-    return label
+    return (label > 0).view(np.uint8)  # label 1,2,3,4 = 1
 
 
 def get_tumor_core_labels(label):
@@ -119,16 +269,20 @@ def get_tumor_core_labels(label):
     tumor core in patient data is label 1 + 3 + 4
     :param label:  numpy array      size : 155 * 240 * 240  value 0-4
     :return:
-    label 155 * 240 * 240
+    label 155 * 240 * 240  uint8
     """
+    return ((label > 0) & (label != 2)).view(np.uint8)  # label 1,3,4 = 1
+
 
-    label = (label == 1) + (label == 3) + (label == 4) + 0  # label 1,3,4 = 1
-    return label
+# axes of np.transpose for each slice direction
+TRANSPOSE_AXES = {'axial': (0, 1, 2), 'sagittal': (2, 0, 1), 'coronal': (1, 0, 2)}
 
 
 def transpose_volumes(volumes, slice_direction):
     """
     transpose a list of volumes
+    the transposed volumes are views, no data is copied here; the single
+    contiguous copy happens later when the cropped volumes are stacked
     inputs:
         volumes: a list of nd volumes
         slice_direction: 'axial', 'sagittal', or 'coronal'
@@ -136,47 +290,137 @@ def transpose_volumes(volumes, slice_direction):
         tr_volumes: a list of transposed volumes
     """
     if (slice_direction == 'axial'):
-        tr_volumes = volumes
-
-    elif(slice_direction == 'sagittal'):
-        tr_volumes = [np.transpose(x, (2, 0, 1)) for x in volumes]
-
-    elif(slice_direction == 'coronal'):
-        tr_volumes = [np.transpose(x, (1, 0, 2)) for x in volumes]
+        return volumes
 
-    else:
+    if slice_direction not in TRANSPOSE_AXES:
         print('undefined slice direction:', slice_direction)
-        tr_volumes = volumes
-    return tr_volumes
+        return volumes
+    axes = TRANSPOSE_AXES[slice_direction]
+    return [x.transpose(axes) for x in volumes]
 
 
-def normalize_one_volume(volume):
+def get_foreground_mean_std(volume):
+    """
+    mean and std of the foreground (volume > 0) voxels, in float64
+    inputs:
+        volume: the input nd volume
+    outputs:
+        mean, std
+    """
+    # streaming statistics: var = E[x^2] - E[x]^2, without a float64 copy of the volume
+    if numba is not None and volume.ndim == 3:
+        n, total, total_sq = _foreground_sums(volume)
+    else:
+        # one slab of the first axis at a time, the float64 buffer stays small
+        n = 0
+        total = 0.0
+        total_sq = 0.0
+        buf = np.empty(volume.shape[1:], dtype=np.float64)
+        for slab in volume:
+            mask = slab > 0  # ignore background
+            np.multiply(slab, mask, out=buf, casting='unsafe')
+            flat = buf.ravel()
+            n += np.count_nonzero(mask)
+            total += float(np.add.reduce(flat))
+            total_sq += float(np.dot(flat, flat))
+    mean = total / n
+    std = np.sqrt(max(total_sq / n - mean * mean, 0.0))
+    return mean, std
+
+
+def normalize_one_volume(volume, dtype=np.float32):
     """
     normalize the itensity of an nd volume based on the mean and std of nonzeor region
     inputs:
         volume: the input nd volume
+        dtype: dtype of the output, e.g. np.float16 to halve the bytes stored;
+               computed in float32 and cast once, the statistics in float64
     outputs:
         out: the normalized nd volume
     """
 
-    pixels = volume[volume > 0]  # ignore background
-    mean = pixels.mean()
-    std = pixels.std()
-    out = (volume - mean) / std
+    mean, std = get_foreground_mean_std(volume)
+    # (volume - mean) / std as one multiply-add pass, rounded to dtype only at the end
+    out = np.multiply(volume, np.float32(1.0 / std), dtype=np.float32)
+    out += np.float32(-mean / std)
+    out = out.astype(dtype, copy=False)
 
     # out_random = np.random.normal(0, 1, size=volume.shape)
     # out[volume == 0] = out_random[volume == 0]
     return out
 
 
+def normalize_transpose(roi, slice_direction='axial'):
+    """
+    normalize_one_volume and transpose_volumes in one step; with numba
+    installed every voxel is read once for the statistics and once more to
+    write the normalized, transposed output
+    :param roi:             type: 3D numpy.array, e.g. a crop_with_box view
+    :param slice_direction: 'axial', 'sagittal', or 'coronal'
+    :return:
+    out     float32 normalized and transposed volume
+    """
+    if numba is None:
+        out = normalize_one_volume(roi)
+        return transpose_volumes([out], slice_direction)[0]
+
+    if slice_direction not in TRANSPOSE_AXES:
+        print('undefined slice direction:', slice_direction)
+        slice_direction = 'axial'
+    axes = TRANSPOSE_AXES[slice_direction]
+
+    mean, std = get_foreground_mean_std(roi)
+    out = np.empty(tuple(roi.shape[a] for a in axes), dtype=np.float32)
+    _normalize_transpose(roi, mean, 1.0 / std, np.array(axes), out)
+    return out
+
+
+def preprocess_modalities(paths, margin, MinBox, bbox_modal=None,
+                          slice_direction='axial', n_jobs=4):
+    """
+    load, crop and normalize the mha volumes of one subject, one thread per
+    modal for each step
+    :param paths:       list of absolute directories of 3D mha images
+    :param margin:      type int           预留边界
+    :param MinBox:      [144 * 192 * 192]
+    :param bbox_modal:  index in paths of the modal giving the non zero
+                        bounding box (Flair), None for the whole volume
+    :param slice_direction: 'axial', 'sagittal', or 'coronal'
+    :param n_jobs:      number of threads
+    :return:
+    volumes             list of cropped, normalized, transposed volumes
+    bbmin, bbmax        bounding box used for the crop
+    """
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        volumes = list(pool.map(load_mha_as_array, paths))
+
+        if bbox_modal is None:
+            bbmin = [0] * volumes[0].ndim  # default bounding box
+            bbmax = [n - 1 for n in volumes[0].shape]
+            bbox_roi = None
+        else:
+            # non zero box and crop of the bbox modal in one call
+            bbmin, bbmax, bbox_roi = bbox_and_crop(volumes[bbox_modal], margin, MinBox)
+        rois = [crop_with_box(volume, bbmin, bbmax, MinBox) if i != bbox_modal
+                else bbox_roi for i, volume in enumerate(volumes)]
+
+        def normalize(roi):
+            return normalize_transpose(roi, slice_direction)
+
+        volumes = list(pool.map(normalize, rois))
+    return volumes, bbmin, bbmax
+
+
 def oneHotLabel(label):
     """
     change 3D label to 4D one hot label
     :param label: 3D numpy
-    :return: 4D numpy
+    :return: 4D numpy  uint8  [label, background]
     """
-    background = 1 - label
-    return np.stack((label, background))
+    out = np.empty((2,) + label.shape, dtype=np.uint8)
+    np.not_equal(label, 0, out=out[0])
+    np.equal(label, 0, out=out[1])
+    return out
 
 
 def Dice(predict, label):
@@ -188,6 +432,25 @@ def Dice(predict, label):
     """
 
 
+# columns of the 4 modals, predict and label in the 192 * 1200 saved canvas
+CANVAS_COLS = [slice(200 * m, 200 * m + 192) for m in range(6)]
+
+
+def _save_uint8_jpeg(data, path):
+    """
+    write a 2D uint8 array as a grayscale jpeg
+    """
+    Image.fromarray(data).save(path, 'JPEG', quality=85, optimize=False)
+
+
+def _log_write_error(future):
+    """
+    done callback of the background writes, so a failed save is not lost
+    """
+    if future.exception() is not None:
+        print('failed to save image: ' + str(future.exception()))
+
+
 def save_train_slice(images, predicts, labels, epoch, save_dir='ckpt'):
     """
     :param images:      5D tensor Batch_Size * 4(modal)  * 16(volume_size) * height * weight
@@ -196,22 +459,29 @@ def save_train_slice(images, predicts, labels, epoch, save_dir='ckpt'):
     :return:
     """
     slice = 1
-    images = np.asarray(images.data)
-    predicts = np.asarray(predicts.data)
-    labels = np.asarray(labels)
+    images = norm_slices(images.data)
+    predicts = norm_slices(predicts.data)
+    labels = norm_slices(labels)
 
     if not os.path.exists(save_dir + 'epoch' + str(epoch)):
         os.mkdir(save_dir + 'epoch' + str(epoch))
 
     for b in range(images.shape[0]):  # for each batch
+        output = np.zeros((images.shape[2], 192, 200 * 6), dtype=np.float32)  # S, H, W
+        for m in range(4):              # for each modal
+            output[:, :, CANVAS_COLS[m]] = images[b, m]
+        output[:, :, CANVAS_COLS[4]] = predicts[b]
+        output[:, :, CANVAS_COLS[5]] = labels[b]
+        # constant slices are left unscaled by norm_slices (e.g. a negative
+        # z-scored background), clip so they do not wrap around in uint8
+        np.clip(output, 0, 1, out=output)
+        output = (output * 255).astype(np.uint8)  # whole batch item at once
         for s in range(images.shape[2]):
-            output = np.zeros((192, 200 * 6))  # H, W
-            for m in range(4):              # for each modal
-                output[:, 200 * m: 200 * m + 192] = norm(images[b, m, s, :, :])
-            output[:, 200 * 4: 200 * 4 + 192] = norm(predicts[b, s, :, :])
-            output[:, 200 * 5: 200 * 5 + 192] = norm(labels[b, s, :, :])
-            scipy.misc.imsave(save_dir + 'epoch' + str(epoch) + '/b_' + str(b)
-                              + '_s' + str(s) + '.jpg', output)
+            # jpeg encoding and disk writes overlap with the training loop
+            future = _io_pool.submit(_save_uint8_jpeg, output[s],
+                                     save_dir + 'epoch' + str(epoch) + '/b_' + str(b)
+                                     + '_s' + str(s) + '.jpg')
+            future.add_done_callback(_log_write_error)
 
 
 def save_train_images(images, predicts, labels, index, epoch, save_dir='ckpt'):
@@ -221,22 +491,25 @@ def save_train_images(images, predicts, labels, index, epoch, save_dir='ckpt'):
     :param labels:      4D Long tensor Batch_Size  * height * weight
     :return:
     """
-    images = np.asarray(images.data)
-    predicts = np.asarray(predicts.data)
-    labels = np.asarray(labels)
+    images = norm_slices(images.data)
+    predicts = norm_slices(predicts.data)
+    labels = norm_slices(labels)
 
     if not os.path.exists(save_dir + 'epoch' + str(epoch)):
         os.mkdir(save_dir + 'epoch' + str(epoch))
 
     for b in range(images.shape[0]):  # for each batch
-        output = np.zeros((192, 200 * 6))  # H, W
+        output = np.zeros((192, 200 * 6), dtype=np.float32)  # H, W
         for m in range(4):              # for each modal
-            output[:, 200 * m: 200 * m + 192] = norm(images[b, m, :, :])
-        output[:, 200 * 4: 200 * 4 + 192] = norm(predicts[b, :, :])
-        output[:, 200 * 5: 200 * 5 + 192] = norm(labels[b, :, :])
+            output[:, CANVAS_COLS[m]] = images[b, m, :, :]
+        output[:, CANVAS_COLS[4]] = predicts[b, :, :]
+        output[:, CANVAS_COLS[5]] = labels[b, :, :]
+        np.clip(output, 0, 1, out=output)  # constant slices may lie outside [0, 1]
+        output = (output * 255).astype(np.uint8)
         name = index[b].split('/')[-1]
-        scipy.misc.imsave(save_dir + 'epoch' + str(epoch) + '/b_' +
-                          str(b) + name + '.jpg', output)
+        future = _io_pool.submit(_save_uint8_jpeg, output, save_dir + 'epoch' + str(epoch) +
+                                 '/b_' + str(b) + name + '.jpg')
+        future.add_done_callback(_log_write_error)
 
 
 def dice(predict, target):
@@ -244,16 +517,16 @@ def dice(predict, target):
 
     :param predict: 4D Long Tensor Batch_Size * 16(volume_size) * height * weight
     :param target:  4D Long Tensor Batch_Size * 16(volume_size) * height * weight
-    :return:
+    :return:        0-dim tensor, call float() on it only when logging
     """
     smooth = 0.00000001
     batch_num = target.shape[0]
     target = target.view(batch_num, -1)
     predict = predict.view(batch_num, -1)
-    intersection = float((target * predict).sum())
+    intersection = (target * predict).sum()
 
-    return (2.0 * intersection + smooth) / (float(predict.sum())
-                                            + float(target.sum()) + smooth)
+    # no float() casts here: each one forces a device -> host sync
+    return (2.0 * intersection + smooth) / (predict.sum() + target.sum() + smooth)
 
 
 def norm(data):
@@ -266,6 +539,18 @@ def norm(data):
         return (data - smin) / (smax - smin)
 
 
+def norm_slices(data):
+    """
+    vectorized norm over the last two axes, every 2D slice is scaled to [0, 1]
+    independently; constant slices are returned unchanged, like norm
+    """
+    data = np.asarray(data, dtype=np.float32)
+    smin = data.min(axis=(-2, -1), keepdims=True)
+    srange = data.max(axis=(-2, -1), keepdims=True) - smin
+    constant = srange == 0
+    return (data - np.where(constant, 0, smin)) / np.where(constant, 1, srange)
+
+
 def netSize(net):
     params = list(net.parameters())
     k = 0
@@ -62,8 +62,9 @@ def test():
             d = dice(predicts, labels[:, 0, :, :, :].long())
             dice_all.append(d)
 
+        dice_all = float(torch.stack(dice_all).mean())  # one device -> host sync
         print 'model epoch' + str(model)
-        print sum(dice_all)/(len(dice_all)*1.0)
+        print dice_all
 
 
 if __name__ =='__main__':
@@ -132,18 +132,21 @@ def run():
                     test_dice.append(d)
 
         # **************** save loss for one batch ****************
+        # dice values stay on the device during the epoch, one sync for each mean
+        train_dice = float(torch.stack(train_dice).mean())
+        test_dice = float(torch.stack(test_dice).mean())
         print 'train_loss ' + str(sum(train_loss) / (len(train_loss) * 1.0))
         print 'test_loss ' + str(sum(test_loss) / (len(test_loss) * 1.0))
-        print 'train_dice ' + str(sum(train_dice) / (len(train_dice) * 1.0))
-        print 'test_dice ' + str(sum(test_dice) / (len(test_dice) * 1.0))
+        print 'train_dice ' + str(train_dice)
+        print 'test_dice ' + str(test_dice)
 
         log_train.write(str(sum(train_loss)/(len(train_loss) * 1.0)) + '\n')
-        log_train_dice.write(str(sum(train_dice) / (len(train_dice) * 1.0)) + '\n')
+        log_train_dice.write(str(train_dice) + '\n')
         log_test.write(str(sum(test_loss) / (len(test_loss) * 1.0)) + '\n')
-        log_test_dice.write(str(sum(test_dice) / (len(test_dice) * 1.0)) + '\n')
+        log_test_dice.write(str(test_dice) + '\n')
 
-        if sum(test_dice) / (len(test_dice) * 1.0) > best_dice:
-            best_dice = sum(test_dice) / (len(test_dice) * 1.0)
+        if test_dice > best_dice:
+            best_dice = test_dice
             best_epoch = epoch
 
         # **************** save model ****************